@@ -65,11 +65,45 @@ def main():
         help='Batch size for saving (default: 10)'
     )
     
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=8.0,
+        help='Maximum API requests per second, lowered automatically on HTTP 429 (default: 8.0)'
+    )
+    
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=16,
+        help='Maximum API requests sent back to back (default: 16)'
+    )
+    
     parser.add_argument(
         '--delay',
         type=float,
-        default=1.0,
-        help='Delay between requests in seconds (default: 1.0)'
+        help='Deprecated: use --rate; sets the rate to 1/DELAY requests per second'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Maximum concurrent comment requests (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--project-workers',
+        type=int,
+        default=1,
+        help='Number of projects scraped concurrently (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--transform-workers',
+        type=int,
+        default=0,
+        help='Worker processes for transforming issues (default: 0, transform in-process)'
     )
     
     parser.add_argument(
@@ -100,7 +134,12 @@ def main():
             state_dir=args.state_dir,
             max_results_per_page=args.max_results,
             batch_size=args.batch_size,
-            delay_between_requests=args.delay
+            requests_per_second=args.rate,
+            delay_between_requests=args.delay,
+            burst=args.burst,
+            transform_workers=args.transform_workers,
+            concurrency=args.concurrency,
+            project_workers=args.project_workers
         ) as scraper:
             
             # Handle reset options
@@ -3,17 +3,56 @@ Data transformation module.
 Converts raw Jira API responses into structured JSONL format suitable for LLM training.
 """
 
-import json
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import os
+import re
+import sys
+from operator import itemgetter
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Union
+from datetime import datetime, timezone
+from pathlib import Path
 import logging
 
+# Handle both package and direct imports
+try:
+    from .json_utils import dumps_line
+except ImportError:
+    # For direct script execution
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.json_utils import dumps_line
+
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns for rendered HTML cleanup (hot path: every issue and comment)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
+# C-level accessor for component names
+_get_name = itemgetter('name')
+
+# Fixed instructions for derived tasks
+_SUMMARIZE_INSTRUCTION = 'Summarize the following Jira issue:'
+_CLASSIFY_INSTRUCTION = 'Classify the following Jira issue by type and status:'
+
 
 class DataTransformer:
     """Transforms Jira issue data into JSONL format with derived tasks."""
     
+    # Issue fields read by transform_issue; request only these from the API
+    REQUIRED_FIELDS = (
+        'summary', 'description', 'status', 'issuetype', 'priority', 'project',
+        'reporter', 'assignee', 'created', 'updated', 'resolutiondate',
+        'labels', 'components', 'comment',
+    )
+    
+    # Run timestamp stamped on every record; refreshed per page by the scraper
+    _scraped_at: str = datetime.now(timezone.utc).isoformat()
+    
+    @classmethod
+    def refresh_scraped_at(cls) -> str:
+        """Refresh and return the timestamp used for 'scraped_at' metadata."""
+        cls._scraped_at = datetime.now(timezone.utc).isoformat()
+        return cls._scraped_at
+    
     @staticmethod
     def extract_text_content(field: Any) -> str:
         """
@@ -29,36 +68,34 @@ class DataTransformer:
             return ""
         
         if isinstance(field, str):
-            # Simple text field
+            # Simple text field; only strip() when there is whitespace to trim
+            if not field or not (field[0].isspace() or field[-1].isspace()):
+                return field
             return field.strip()
         
         if isinstance(field, dict):
             # Structured field (e.g., rendered content, user objects)
             if 'rendered' in field:
-                # Extract text from rendered HTML (basic cleanup)
-                import re
-                text = field['rendered']
-                # Remove HTML tags (basic)
-                text = re.sub(r'<[^>]+>', '', text)
-                # Clean up whitespace
-                text = re.sub(r'\s+', ' ', text)
+                # Extract text from rendered HTML: remove tags, then collapse whitespace
+                text = _WS_RE.sub(' ', _TAG_RE.sub('', field['rendered']))
                 return text.strip()
             
-            if 'name' in field:
-                return str(field['name'])
+            # Common leaf shapes (status, issuetype, priority, project, users):
+            # one lookup per key, and no str() call when the value is already text
+            name = field.get('name')
+            if name is not None:
+                return name if type(name) is str else str(name)
             
-            if 'displayName' in field:
-                return str(field['displayName'])
+            display_name = field.get('displayName')
+            if display_name is not None:
+                return display_name if type(display_name) is str else str(display_name)
             
-            if 'value' in field:
-                return str(field['value'])
+            value = field.get('value')
+            if value is not None:
+                return value if type(value) is str else str(value)
             
             # Fallback: try to extract any string values
-            text_parts = []
-            for key, value in field.items():
-                if isinstance(value, str):
-                    text_parts.append(value)
-            return " ".join(text_parts).strip()
+            return " ".join(value for value in field.values() if isinstance(value, str)).strip()
         
         return str(field).strip()
     
@@ -67,10 +104,21 @@ class DataTransformer:
         """Format ISO timestamp to readable format."""
         if not timestamp:
             return None
+        # Fast path: Jira always sends 'YYYY-MM-DDTHH:MM:SS.sss+ZZZZ', so the
+        # date and time can be sliced out directly without parsing
+        if (
+            isinstance(timestamp, str)
+            and len(timestamp) >= 19
+            and timestamp[10] == 'T'
+            and timestamp[4] == '-' and timestamp[7] == '-'
+            and timestamp[13] == ':' and timestamp[16] == ':'
+        ):
+            return f"{timestamp[:10]} {timestamp[11:19]} UTC"
         try:
             dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
             return dt.strftime('%Y-%m-%d %H:%M:%S UTC')
-        except:
+        except (AttributeError, TypeError, ValueError):
+            # Unparseable string or non-string value: keep as-is
             return timestamp
     
     @staticmethod
@@ -82,8 +130,13 @@ class DataTransformer:
     @staticmethod
     def extract_components(issue: Dict) -> List[str]:
         """Extract component names from issue."""
-        components = issue.get('fields', {}).get('components', [])
-        return [comp.get('name', '') for comp in components if isinstance(comp, dict)]
+        components = issue.get('fields', {}).get('components') or []
+        try:
+            # Fast path: Jira returns a list of dicts that all carry a name
+            return list(map(_get_name, components))
+        except (KeyError, TypeError):
+            # Malformed entries: skip non-dicts, default missing names
+            return [comp.get('name', '') for comp in components if isinstance(comp, dict)]
     
     @staticmethod
     def extract_comments(issue: Dict, comments_data: Optional[Dict] = None) -> List[Dict]:
@@ -98,14 +151,19 @@ class DataTransformer:
             List of comment dictionaries
         """
         comments = []
+        # Comments are keyed by their short Jira id (body text only if the id is missing)
+        seen: Set[str] = set()
         
         # Try to get from separate comments endpoint
         if comments_data:
             comment_list = comments_data.get('comments', [])
             for comment in comment_list:
+                body = DataTransformer.extract_text_content(comment.get('body'))
+                comment_id = comment.get('id')
+                seen.add(body if comment_id is None else comment_id)
                 comments.append({
                     'author': DataTransformer.extract_text_content(comment.get('author')),
-                    'body': DataTransformer.extract_text_content(comment.get('body')),
+                    'body': body,
                     'created': DataTransformer.format_timestamp(comment.get('created')),
                     'updated': DataTransformer.format_timestamp(comment.get('updated'))
                 })
@@ -114,18 +172,22 @@ class DataTransformer:
         comment_field = issue.get('fields', {}).get('comment', {})
         if comment_field and 'comments' in comment_field:
             for comment in comment_field['comments']:
-                # Avoid duplicates
-                existing = any(
-                    c.get('body') == DataTransformer.extract_text_content(comment.get('body'))
-                    for c in comments
-                )
-                if not existing:
-                    comments.append({
-                        'author': DataTransformer.extract_text_content(comment.get('author')),
-                        'body': DataTransformer.extract_text_content(comment.get('body')),
-                        'created': DataTransformer.format_timestamp(comment.get('created')),
-                        'updated': DataTransformer.format_timestamp(comment.get('updated'))
-                    })
+                # Avoid duplicates; checking the id first skips body extraction for them
+                key = comment.get('id')
+                if key is not None and key in seen:
+                    continue
+                body = DataTransformer.extract_text_content(comment.get('body'))
+                if key is None:
+                    key = body
+                    if key in seen:
+                        continue
+                seen.add(key)
+                comments.append({
+                    'author': DataTransformer.extract_text_content(comment.get('author')),
+                    'body': body,
+                    'created': DataTransformer.format_timestamp(comment.get('created')),
+                    'updated': DataTransformer.format_timestamp(comment.get('updated'))
+                })
         
         return comments
     
@@ -145,41 +207,56 @@ class DataTransformer:
         status = issue_data.get('status', 'Unknown')
         issue_type = issue_data.get('issue_type', 'Unknown')
         
-        # Combine issue text
+        # Combine issue text (join builds the comment block in a single allocation)
         full_text = f"{title}\n\n{description}"
-        if issue_data.get('comments'):
-            full_text += "\n\nComments:\n"
-            for comment in issue_data['comments']:
-                full_text += f"- {comment.get('author', 'Unknown')}: {comment.get('body', '')}\n"
+        comments = issue_data.get('comments')
+        if comments:
+            comment_block = "".join(
+                f"- {comment.get('author', 'Unknown')}: {comment.get('body', '')}\n"
+                for comment in comments
+            )
+            full_text = f"{full_text}\n\nComments:\n{comment_block}"
+        
+        # Truncate once up front; the shorter head is cut from the already-short
+        # 500-char slice rather than from a possibly very long description
+        context = full_text[:1000]
+        description_head = description[:500]
+        answer_head = description_head[:200]
         
         tasks = {
             'summarization': {
-                'instruction': 'Summarize the following Jira issue:',
+                'instruction': _SUMMARIZE_INSTRUCTION,
                 'input': full_text,
                 'output': f"Issue {issue_key}: {title} (Status: {status}, Type: {issue_type})"
             },
             'classification': {
-                'instruction': 'Classify the following Jira issue by type and status:',
-                'input': f"{title}\n\n{description[:500]}",  # Truncate for classification
+                'instruction': _CLASSIFY_INSTRUCTION,
+                'input': f"{title}\n\n{description_head}",
                 'output': f"Type: {issue_type}, Status: {status}"
             },
             'qa_generation': {
                 'question': f"What is the issue {issue_key} about?",
-                'context': full_text[:1000] if len(full_text) > 1000 else full_text,  # Truncate context if needed
-                'answer': f"{title} - {description[:200]}" if description else title
+                'context': context,
+                'answer': f"{title} - {answer_head}" if description else title
             }
         }
         
         return tasks
     
     @classmethod
-    def transform_issue(cls, issue: Dict, comments_data: Optional[Dict] = None) -> Optional[Dict]:
+    def transform_issue(
+        cls,
+        issue: Dict,
+        comments_data: Optional[Dict] = None,
+        scraped_at: Optional[str] = None
+    ) -> Optional[Dict]:
         """
         Transform a single issue from Jira API format to JSONL format.
         
         Args:
             issue: Raw issue dictionary from Jira API
             comments_data: Optional separate comments API response
+            scraped_at: Optional scrape timestamp (default: the cached run timestamp)
             
         Returns:
             Transformed issue dictionary or None if invalid
@@ -241,7 +318,7 @@ class DataTransformer:
                 'comment_count': len(comments),
                 'metadata': {
                     'raw_issue_key': issue_key,
-                    'scraped_at': datetime.utcnow().isoformat(),
+                    'scraped_at': scraped_at or cls._scraped_at,
                     'source': 'apache-jira'
                 }
             }
@@ -256,16 +333,20 @@ class DataTransformer:
             return None
     
     @staticmethod
-    def write_jsonl(data: List[Dict], output_file: str):
+    def write_jsonl(data: List[Dict], output: Union[str, os.PathLike, BinaryIO]):
         """
         Write list of dictionaries to JSONL file.
         
         Args:
             data: List of dictionaries to write
-            output_file: Output file path
+            output: Output file path, or a file handle already open in binary
+                append mode (preferred for repeated batches, avoids reopening)
         """
-        with open(output_file, 'a', encoding='utf-8') as f:
-            for item in data:
-                if item:  # Skip None values
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
-
+        # Join the batch into one payload so it is written in as few syscalls as possible
+        payload = b''.join(dumps_line(item) for item in data if item)  # Skip None values
+        
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, 'ab') as f:
+                f.write(payload)
+        else:
+            output.write(payload)
@@ -3,26 +3,86 @@ Jira API Client with rate limiting, retry logic, and error handling.
 Handles HTTP 429, 5xx errors, timeouts, and network failures gracefully.
 """
 
+import os
+import random
+import sys
+import threading
 import time
 import requests
-from typing import Dict, List, Optional, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Dict, List, Optional, Sequence
 from datetime import datetime
+from pathlib import Path
 import logging
 
+# Handle both package and direct imports
+try:
+    from .json_utils import dumps, loads
+    from .rate_limiter import RateLimiter
+except ImportError:
+    # For direct script execution
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.json_utils import dumps, loads
+    from src.rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
 
+class _ServerErrorRetry(Retry):
+    """
+    Retry policy for server errors.
+    
+    Never retries 429 responses (even with a Retry-After header), and paces
+    every retried request through the client's rate limiter.
+    """
+    
+    # urllib3 retries these whenever Retry-After is present, regardless of
+    # status_forcelist; 429 must reach _make_request so throttling is seen
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+    
+    def __init__(self, *args, rate_limiter: Optional[RateLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+    
+    def new(self, **kw):
+        # urllib3 builds a fresh Retry per attempt; carry the limiter over
+        retry = super().new(**kw)
+        retry.rate_limiter = self.rate_limiter
+        return retry
+    
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+
 class JiraClient:
     """Client for interacting with Apache Jira REST API with robust error handling."""
     
     BASE_URL = "https://issues.apache.org/jira/rest/api/2"
     
+    # How long cached project info stays valid (seconds)
+    PROJECT_CACHE_TTL = 3600
+    
+    # Upper bound for a single retry backoff (seconds)
+    MAX_BACKOFF = 60.0
+    
+    # Default result ordering for project searches. Ascending key order is
+    # index-backed and stable: new issues are appended at the end, so saved
+    # pagination offsets remain valid between runs
+    DEFAULT_ORDER = "key ASC"
+    
     def __init__(
         self,
         max_retries: int = 5,
         retry_delay: float = 1.0,
         timeout: int = 30,
-        rate_limit_delay: float = 1.0
+        rate_limit_delay: float = 1.0,
+        cache_dir: Optional[str] = None,
+        pool_size: int = 10,
+        requests_per_second: float = 8.0,
+        burst: int = 16
     ):
         """
         Initialize Jira client.
@@ -32,16 +92,96 @@ class JiraClient:
             retry_delay: Base delay between retries (seconds)
             timeout: Request timeout (seconds)
             rate_limit_delay: Delay after rate limit (seconds)
+            cache_dir: Optional directory for persisting project info across runs
+            pool_size: Keep-alive connections kept open to the Jira host; should be
+                at least the number of threads issuing requests concurrently
+            requests_per_second: Maximum request rate, reduced automatically on HTTP 429
+                (0 disables pacing)
+            burst: Maximum number of requests sent back to back
         """
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.timeout = timeout
         self.rate_limit_delay = rate_limit_delay
+        self.cache_file = Path(cache_dir) / "project_cache.json" if cache_dir else None
+        self._project_cache: Dict[str, Dict] = self._load_project_cache()
+        # Project threads may update the cache concurrently
+        self._cache_lock = threading.Lock()
+        self.rate_limiter = RateLimiter(rate=requests_per_second, burst=burst)
         self.session = requests.Session()
         self.session.headers.update({
             'Accept': 'application/json',
             'User-Agent': 'Apache-Jira-Scraper/1.0'
         })
+        # Transient server errors (5xx) are retried by urllib3 with exponential
+        # backoff (each retry paced by the rate limiter); timeouts, connection
+        # errors and 429s are handled in _make_request
+        retry = _ServerErrorRetry(
+            total=max_retries - 1,
+            # connect=0 (not False) so connection failures are wrapped in
+            # requests' ConnectionError and retried by _make_request; read=False
+            # lets read timeouts surface as requests' ReadTimeout
+            connect=0,
+            read=False,
+            backoff_factor=retry_delay,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            rate_limiter=self.rate_limiter
+        )
+        # All requests go to one host, so a single pool sized for the concurrent
+        # callers lets every thread reuse a warm TLS connection
+        self.session.mount(
+            'https://',
+            HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        )
+    
+    def _backoff(self, attempt: int) -> float:
+        """
+        Exponential backoff with full jitter for the given attempt.
+        
+        Randomizing the whole interval keeps concurrent scrapers from retrying
+        in lockstep against a struggling server.
+        """
+        return random.uniform(0, min(self.MAX_BACKOFF, self.retry_delay * (2 ** attempt)))
+    
+    def _wait_for_retry(self, attempt: int, wait_time: float, reason: str, url: str) -> bool:
+        """
+        Sleep before retrying a failed attempt.
+        
+        Args:
+            attempt: Zero-based attempt number that just failed
+            wait_time: Seconds to wait before the next attempt
+            reason: Short description of the failure for logging
+            url: Requested URL
+            
+        Returns:
+            True if another attempt should be made, False if retries are exhausted
+        """
+        if attempt >= self.max_retries - 1:
+            logger.error(f"Max retries exceeded due to {reason} for {url}")
+            return False
+        logger.warning(
+            f"Request failed ({reason}). Attempt {attempt + 1}/{self.max_retries}. "
+            f"Waiting {wait_time:.1f}s..."
+        )
+        time.sleep(wait_time)
+        return True
+    
+    @staticmethod
+    def _parse_json(response: requests.Response, url: str) -> Optional[Dict]:
+        """Parse a successful response body, returning None if it is empty or malformed."""
+        try:
+            # Parse the raw bytes directly (orjson when available)
+            data = loads(response.content)
+        except ValueError as e:
+            logger.error(f"Failed to parse JSON response from {url}: {e}")
+            return None
+        # Check for empty data
+        if data is None:
+            logger.warning(f"Empty response from {url}")
+        return data
     
     def _make_request(
         self,
@@ -65,6 +205,7 @@ class JiraClient:
         
         for attempt in range(self.max_retries):
             try:
+                self.rate_limiter.acquire()
                 response = self.session.request(
                     method=method,
                     url=url,
@@ -73,75 +214,43 @@ class JiraClient:
                     **kwargs
                 )
                 
+                status = response.status_code
+                
+                # Handle successful response (checked first: by far the common case)
+                if status == 200:
+                    self.rate_limiter.on_success()
+                    return self._parse_json(response, url)
+                
                 # Handle rate limiting (429)
-                if response.status_code == 429:
+                if status == 429:
+                    self.rate_limiter.on_throttled()
                     retry_after = float(response.headers.get('Retry-After', self.rate_limit_delay))
-                    logger.warning(f"Rate limited. Waiting {retry_after}s before retry...")
-                    time.sleep(retry_after)
-                    continue
-                
-                # Handle server errors (5xx)
-                if response.status_code >= 500:
-                    wait_time = self.retry_delay * (2 ** attempt)  # Exponential backoff
-                    logger.warning(
-                        f"Server error {response.status_code}. "
-                        f"Attempt {attempt + 1}/{self.max_retries}. Waiting {wait_time}s..."
-                    )
-                    if attempt < self.max_retries - 1:
-                        time.sleep(wait_time)
+                    if self._wait_for_retry(attempt, retry_after, "rate limiting", url):
                         continue
-                    else:
-                        logger.error(f"Max retries exceeded for {url}")
-                        return None
-                
-                # Handle client errors (4xx except 429)
-                if 400 <= response.status_code < 500:
-                    logger.error(f"Client error {response.status_code} for {url}: {response.text[:200]}")
                     return None
                 
-                # Handle successful response
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        # Check for empty or malformed data
-                        if data is None:
-                            logger.warning(f"Empty response from {url}")
-                            return None
-                        return data
-                    except ValueError as e:
-                        logger.error(f"Failed to parse JSON response from {url}: {e}")
-                        return None
-                
-                # Unexpected status code
-                logger.warning(f"Unexpected status code {response.status_code} for {url}")
+                # Remaining statuses are handled by class
+                status_class = status // 100
+                if status_class == 5:
+                    # Server errors; the adapter has already retried them
+                    logger.error(f"Server error {status} for {url} after retries")
+                elif status_class == 4:
+                    # Client errors (except 429)
+                    logger.error(f"Client error {status} for {url}: {response.text[:200]}")
+                else:
+                    logger.warning(f"Unexpected status code {status} for {url}")
                 return None
                 
-            except requests.exceptions.Timeout:
-                wait_time = self.retry_delay * (2 ** attempt)
-                logger.warning(
-                    f"Request timeout. Attempt {attempt + 1}/{self.max_retries}. "
-                    f"Waiting {wait_time}s..."
-                )
-                if attempt < self.max_retries - 1:
-                    time.sleep(wait_time)
-                    continue
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                # Transient network failures: retry with backoff
+                if isinstance(e, requests.exceptions.Timeout):
+                    reason = "timeout"
                 else:
-                    logger.error(f"Max retries exceeded due to timeout for {url}")
-                    return None
-                    
-            except requests.exceptions.ConnectionError as e:
-                wait_time = self.retry_delay * (2 ** attempt)
-                logger.warning(
-                    f"Connection error: {e}. Attempt {attempt + 1}/{self.max_retries}. "
-                    f"Waiting {wait_time}s..."
-                )
-                if attempt < self.max_retries - 1:
-                    time.sleep(wait_time)
+                    reason = f"connection error: {e}"
+                if self._wait_for_retry(attempt, self._backoff(attempt), reason, url):
                     continue
-                else:
-                    logger.error(f"Max retries exceeded due to connection error for {url}")
-                    return None
-                    
+                return None
+                
             except Exception as e:
                 logger.error(f"Unexpected error during request to {url}: {e}")
                 return None
@@ -153,7 +262,8 @@ class JiraClient:
         project: str,
         start_at: int = 0,
         max_results: int = 50,
-        jql: Optional[str] = None
+        jql: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
     ) -> Optional[Dict]:
         """
         Search for issues in a project.
@@ -163,34 +273,44 @@ class JiraClient:
             start_at: Starting index for pagination
             max_results: Maximum number of results per page
             jql: Optional JQL query string
+            fields: Optional field names to return (default: all fields)
             
         Returns:
             Search results dictionary or None if failed
         """
         if jql is None:
-            jql = f"project = {project} ORDER BY created DESC"
+            jql = f"project = {project} ORDER BY {self.DEFAULT_ORDER}"
         
         params = {
             'jql': jql,
             'startAt': start_at,
-            'maxResults': max_results,
-            'expand': 'changelog,renderedFields'
+            'maxResults': max_results
         }
+        if fields:
+            params['fields'] = ','.join(fields)
         
         return self._make_request('GET', 'search', params=params)
     
-    def get_issue(self, issue_key: str, expand: str = 'changelog,renderedFields') -> Optional[Dict]:
+    def get_issue(
+        self,
+        issue_key: str,
+        expand: str = '',
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[Dict]:
         """
         Get detailed information about a specific issue.
         
         Args:
             issue_key: Issue key (e.g., 'SPARK-12345')
             expand: Fields to expand in response
+            fields: Optional field names to return (default: all fields)
             
         Returns:
             Issue dictionary or None if failed
         """
         params = {'expand': expand} if expand else {}
+        if fields:
+            params['fields'] = ','.join(fields)
         return self._make_request('GET', f'issue/{issue_key}', params=params)
     
     def get_issue_comments(self, issue_key: str) -> Optional[Dict]:
@@ -209,13 +329,50 @@ class JiraClient:
         """
         Get project information.
         
+        Served from the project cache when a fresh entry exists, so resumed
+        runs do not re-request it.
+        
         Args:
             project_key: Project key
             
         Returns:
             Project dictionary or None if failed
         """
-        return self._make_request('GET', f'project/{project_key}')
+        cached = self._project_cache.get(project_key)
+        if cached and time.time() - cached.get('fetched_at', 0) < self.PROJECT_CACHE_TTL:
+            logger.debug(f"Using cached project info for {project_key}")
+            return cached.get('data')
+        
+        data = self._make_request('GET', f'project/{project_key}')
+        if data is not None:
+            with self._cache_lock:
+                self._project_cache[project_key] = {'fetched_at': time.time(), 'data': data}
+                self._save_project_cache()
+        return data
+    
+    def _load_project_cache(self) -> Dict[str, Dict]:
+        """Load cached project info from disk if it exists."""
+        if self.cache_file is None or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'rb') as f:
+                return loads(f.read())
+        except Exception as e:
+            logger.warning(f"Failed to load project cache: {e}. Ignoring it.")
+            return {}
+    
+    def _save_project_cache(self):
+        """Persist cached project info to disk (caller holds _cache_lock)."""
+        if self.cache_file is None:
+            return
+        try:
+            # Write a temporary file and swap it in, so readers never see a partial file
+            tmp_file = self.cache_file.with_suffix('.json.tmp')
+            with open(tmp_file, 'wb') as f:
+                f.write(dumps(self._project_cache))
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Failed to save project cache: {e}")
     
     def __enter__(self):
         return self
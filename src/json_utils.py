@@ -0,0 +1,44 @@
+"""
+JSON encoding helpers.
+Uses orjson when it is installed and falls back to the standard library otherwise.
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize an object to compact UTF-8 encoded JSON.
+    
+    Args:
+        obj: Object to serialize
+        default: Optional converter for types JSON does not support (e.g. sets)
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserialize JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_line(obj: Any) -> bytes:
+    """
+    Serialize an object to a single UTF-8 encoded JSONL line (including trailing newline).
+    
+    Both backends emit compact separators and non-ASCII characters unescaped,
+    so the output is byte-identical whichever one is in use.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
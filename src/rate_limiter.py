@@ -0,0 +1,74 @@
+"""
+Adaptive request pacing for the Jira API.
+Token bucket whose rate backs off multiplicatively on throttling and recovers gradually.
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket with AIMD rate adaptation.
+    
+    Requests proceed immediately while tokens are available. On HTTP 429 the
+    rate is halved; after a run of successful responses it grows by 10% again,
+    up to the configured maximum.
+    """
+    
+    # Consecutive successes required before the rate is increased
+    INCREASE_AFTER = 20
+    
+    def __init__(self, rate: float = 8.0, burst: int = 16, min_rate: float = 0.1):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            rate: Maximum (and initial) requests per second; 0 disables pacing
+            burst: Maximum number of requests that may be issued back to back
+            min_rate: Lower bound for the rate after repeated throttling
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._successes = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent."""
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve a token now; a negative balance is the wait owed by this caller
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+    
+    def on_success(self):
+        """Record a successful response (additive increase)."""
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.INCREASE_AFTER and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.1)
+                self._successes = 0
+    
+    def on_throttled(self):
+        """Record a rate-limit response (multiplicative decrease)."""
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            self._successes = 0
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            logger.info(f"Throttled by server. Reducing request rate to {self.rate:.2f}/s")
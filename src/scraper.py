@@ -3,13 +3,22 @@ Main scraping orchestration module.
 Coordinates API calls, state management, and data transformation.
 """
 
+import queue
+import random
+import threading
 import time
 import sys
-from typing import List, Optional
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
 from pathlib import Path
 import logging
 from tqdm import tqdm
 
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
 # Handle both package and direct imports
 try:
     from .jira_client import JiraClient
@@ -25,6 +34,29 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+class _ZstdFrameWriter:
+    """
+    Append-only writer that compresses each write() into a complete zstd frame.
+    
+    Every frame is self-contained, so a run that ends without closing the file
+    cannot leave an unterminated frame that corrupts frames appended later.
+    """
+    
+    def __init__(self, path: Path, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._file = open(path, 'ab')
+    
+    def write(self, data: bytes) -> int:
+        self._file.write(self._compressor.compress(data))
+        return len(data)
+    
+    def flush(self):
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+
 class JiraScraper:
     """Main scraper class that orchestrates the entire scraping process."""
     
@@ -35,7 +67,12 @@ class JiraScraper:
         state_dir: str = "state",
         max_results_per_page: int = 50,
         batch_size: int = 10,
-        delay_between_requests: float = 1.0
+        requests_per_second: float = 8.0,
+        burst: int = 16,
+        transform_workers: int = 0,
+        concurrency: int = 4,
+        project_workers: int = 1,
+        delay_between_requests: Optional[float] = None
     ):
         """
         Initialize scraper.
@@ -46,21 +83,59 @@ class JiraScraper:
             state_dir: Directory for state files
             max_results_per_page: Results per API page
             batch_size: Number of issues to process before saving state
-            delay_between_requests: Delay between API requests (seconds)
+            requests_per_second: Maximum API request rate (adapts down on HTTP 429)
+            burst: Maximum number of API requests sent back to back
+            transform_workers: Worker processes for issue transformation
+                (0 transforms in the main process)
+            concurrency: Maximum number of comment requests in flight at once
+            project_workers: Number of projects scraped concurrently
+            delay_between_requests: Deprecated; overrides requests_per_second
+                with 1 / delay (0 disables pacing)
         """
+        if delay_between_requests is not None:
+            logger.warning("delay_between_requests is deprecated; use requests_per_second instead")
+            requests_per_second = 1.0 / delay_between_requests if delay_between_requests > 0 else 0
         self.projects = projects
         self.output_file = Path(output_file)
+        if self.output_file.suffix == '.zst' and zstandard is None:
+            raise ImportError("Writing .zst output requires the 'zstandard' package (pip install zstandard)")
         self.max_results_per_page = max_results_per_page
         self.batch_size = batch_size
-        self.delay_between_requests = delay_between_requests
+        self.project_workers = max(1, project_workers)
         
         # Initialize components
-        self.client = JiraClient()
         self.state_manager = StateManager(state_dir)
+        # One connection per fetch thread, plus one per project thread for its own searches
+        self.client = JiraClient(
+            cache_dir=state_dir,
+            pool_size=max(1, concurrency) + self.project_workers,
+            requests_per_second=requests_per_second,
+            burst=burst
+        )
         self.transformer = DataTransformer()
+        self._executor = (
+            ProcessPoolExecutor(max_workers=transform_workers) if transform_workers > 0 else None
+        )
+        # Comment fetches are I/O-bound; overlap them on threads sharing the client session
+        self._fetch_pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
         
-        # Ensure output file exists (will append if exists)
+        # Keep a single buffered O_APPEND handle open for the scraper's lifetime
+        # (appends if exists), flushed once per batch; a batch larger than the
+        # buffer is written straight through, retrying short writes
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        if self.output_file.suffix == '.zst':
+            # Each batch becomes its own zstd frame; concatenated frames decode as one stream
+            self._out = _ZstdFrameWriter(self.output_file)
+        else:
+            self._out = open(self.output_file, 'ab')
+        # Serializes output writes across project threads
+        self._write_lock = threading.Lock()
+        # Set to ask project threads to stop after their current page
+        self._stop = threading.Event()
+        # Terminal rows for progress bars, one per concurrently scraped project
+        self._bar_positions = queue.SimpleQueue()
+        for position in range(self.project_workers):
+            self._bar_positions.put(position)
         
         logger.info(f"Initialized scraper for projects: {', '.join(projects)}")
     
@@ -91,17 +166,16 @@ class JiraScraper:
         
         # Get progress state
         progress = self.state_manager.get_project_progress(project)
-        start_at = progress.get('start_at', 0)
+        # Offsets only hold for the ordering they were recorded with; progress saved
+        # under another ordering restarts at 0 and relies on processed_issues to skip
+        order = self.client.DEFAULT_ORDER
+        start_at = progress.get('start_at', 0) if progress.get('order') == order else 0
         
         total_scraped = 0
         batch = []
         
-        # Initial search to get total count
-        search_results = self.client.search_issues(
-            project=project,
-            start_at=0,
-            max_results=1
-        )
+        # The first page also carries the total count, so no separate count request
+        search_results = self._search_page(project, start_at)
         
         if not search_results:
             logger.error(f"Failed to get issue count for {project}")
@@ -110,110 +184,203 @@ class JiraScraper:
         total_issues = search_results.get('total', 0)
         logger.info(f"Total issues in {project}: {total_issues}")
         
-        # Progress bar
+        # Progress bar (refreshed at most once a second; hidden when stderr is not a terminal),
+        # on its own row so bars of concurrently scraped projects do not overwrite each other
+        position = self._bar_positions.get()
         pbar = tqdm(
             total=total_issues,
             desc=f"Scraping {project}",
             initial=len(processed_issues),
-            unit="issues"
+            unit="issues",
+            position=position,
+            mininterval=1.0,
+            miniters=max(100, total_issues // 200),
+            disable=not sys.stderr.isatty()
         )
         
         # Scrape with pagination
         current_start = start_at
+        # Whether current_start is ahead of the saved progress, waiting for the
+        # rest of the previous page to be written
+        progress_deferred = False
         consecutive_failures = 0
         max_consecutive_failures = 5
+        # Future for the page at current_start, requested ahead of time; seeded
+        # with the first page, which has already been fetched
+        next_page = Future()
+        next_page.set_result(search_results)
         
-        while current_start < total_issues:
-            # Rate limiting
-            time.sleep(self.delay_between_requests)
-            
-            # Search for issues
-            search_results = self.client.search_issues(
-                project=project,
-                start_at=current_start,
-                max_results=self.max_results_per_page
-            )
-            
-            if not search_results:
-                consecutive_failures += 1
-                logger.warning(
-                    f"Failed to get search results for {project} at start_at={current_start}. "
-                    f"Consecutive failures: {consecutive_failures}"
-                )
+        try:
+            while current_start < total_issues and not self._stop.is_set():
+                # Search for issues (use the prefetched page when there is one)
+                if next_page is not None:
+                    search_results = next_page.result()
+                    next_page = None
+                else:
+                    search_results = self._search_page(project, current_start)
                 
-                if consecutive_failures >= max_consecutive_failures:
-                    logger.error(f"Too many consecutive failures for {project}. Stopping.")
-                    break
+                if not search_results:
+                    consecutive_failures += 1
+                    logger.warning(
+                        f"Failed to get search results for {project} at start_at={current_start}. "
+                        f"Consecutive failures: {consecutive_failures}"
+                    )
+                    
+                    if consecutive_failures >= max_consecutive_failures:
+                        logger.error(f"Too many consecutive failures for {project}. Stopping.")
+                        break
+                    
+                    # Exponential backoff with full jitter
+                    time.sleep(random.uniform(0, 2 ** consecutive_failures))
+                    continue
                 
-                # Exponential backoff
-                time.sleep(2 ** consecutive_failures)
-                continue
-            
-            consecutive_failures = 0
-            
-            issues = search_results.get('issues', [])
-            if not issues:
-                logger.info(f"No more issues found for {project}")
-                break
-            
-            # Process each issue
-            for issue in issues:
-                issue_key = issue.get('key', '')
+                consecutive_failures = 0
                 
-                # Skip if already processed
-                if issue_key in processed_issues:
-                    pbar.update(1)
-                    continue
+                issues = search_results.get('issues', [])
+                if not issues:
+                    logger.info(f"No more issues found for {project}")
+                    break
                 
-                # Get detailed issue data (may already be in search results)
-                issue_data = issue
+                # Request the next page while this page's comments are fetched and transformed
+                next_start = current_start + len(issues)
+                if len(issues) >= self.max_results_per_page and next_start < total_issues:
+                    next_page = self._fetch_pool.submit(self._search_page, project, next_start)
                 
-                # Fetch comments separately for completeness
-                comments_data = None
-                if self.delay_between_requests > 0:
-                    time.sleep(self.delay_between_requests * 0.5)  # Shorter delay for comments
+                # Skip issues that were already processed (already counted by the
+                # progress bar's initial value)
+                new_issues = [issue for issue in issues if issue.get('key', '') not in processed_issues]
                 
-                comments_data = self.client.get_issue_comments(issue_key)
+                # Comments come embedded in the search results; only issues whose embedded
+                # list is missing or truncated need a separate request (several in flight)
+                overflow_keys = [
+                    issue.get('key', '') for issue in new_issues if self._comments_truncated(issue)
+                ]
+                fetched_comments = dict(
+                    zip(overflow_keys, self._fetch_pool.map(self._fetch_comments, overflow_keys))
+                )
+                pending = [(issue, fetched_comments.get(issue.get('key', ''))) for issue in new_issues]
                 
-                # Transform issue
-                transformed = self.transformer.transform_issue(issue_data, comments_data)
+                # Transform the page and save in batches
+                for (issue, _), transformed in zip(pending, self._transform_page(pending)):
+                    if transformed:
+                        batch.append(transformed)
+                        total_scraped += 1
+                    
+                    # Save batch periodically
+                    if len(batch) >= self.batch_size:
+                        # Detach the batch first so the finally block below never
+                        # writes it again if saving is interrupted part-way
+                        to_save, batch = batch, []
+                        self._save_batch(project, to_save, current_start if progress_deferred else None, order)
+                        progress_deferred = False
+                        logger.debug(f"Saved batch of {self.batch_size} issues")
                 
-                if transformed:
-                    batch.append(transformed)
-                    self.state_manager.mark_issue_processed(project, issue_key)
-                    total_scraped += 1
+                pbar.update(len(pending))
                 
-                # Save batch periodically
-                if len(batch) >= self.batch_size:
-                    self.transformer.write_jsonl(batch, str(self.output_file))
-                    self.state_manager.update_project_progress(
-                        project,
-                        current_start,
-                        issue_key
-                    )
-                    self.state_manager.save_state()
-                    batch = []
-                    logger.debug(f"Saved batch of {self.batch_size} issues")
+                # Update progress once per page (deferred to the next batch save while part
+                # of this page is still unwritten, so the offset never skips past it)
+                current_start += len(issues)
+                if batch:
+                    progress_deferred = True
+                else:
+                    self.state_manager.update_project_progress(project, current_start, order=order)
                 
-                pbar.update(1)
-            
-            # Update progress
-            current_start += len(issues)
-            self.state_manager.update_project_progress(project, current_start)
+                # Check if we've reached the end
+                if len(issues) < self.max_results_per_page:
+                    break
+        finally:
+            # Save remaining batch (also when interrupted, so already transformed
+            # issues reach the output and their state is saved consistently)
+            if batch:
+                self._save_batch(project, batch, current_start if progress_deferred else None, order)
             
-            # Check if we've reached the end
-            if len(issues) < self.max_results_per_page:
-                break
-        
-        # Save remaining batch
-        if batch:
-            self.transformer.write_jsonl(batch, str(self.output_file))
-            self.state_manager.save_state()
+            pbar.close()
+            self._bar_positions.put(position)
         
-        pbar.close()
         logger.info(f"Completed scraping {project}. Total scraped: {total_scraped}")
         return total_scraped
     
+    def _search_page(self, project: str, start_at: int) -> Optional[dict]:
+        """Fetch one page of search results (may run on the fetch thread pool)."""
+        return self.client.search_issues(
+            project=project,
+            start_at=start_at,
+            max_results=self.max_results_per_page,
+            fields=DataTransformer.REQUIRED_FIELDS
+        )
+    
+    @staticmethod
+    def _comments_truncated(issue: dict) -> bool:
+        """Check whether an issue's embedded comment list is missing or incomplete."""
+        comment_field = issue.get('fields', {}).get('comment')
+        if not comment_field:
+            return True
+        return comment_field.get('total', 0) > len(comment_field.get('comments', []))
+    
+    def _fetch_comments(self, issue_key: str) -> Optional[dict]:
+        """Fetch comments for one issue (runs on the fetch thread pool)."""
+        return self.client.get_issue_comments(issue_key)
+    
+    def _transform_page(self, pending: List[Tuple[dict, Optional[dict]]]) -> Iterable[Optional[dict]]:
+        """
+        Transform (issue, comments) pairs, in worker processes when configured.
+        
+        Results are yielded in input order.
+        """
+        issues = [issue for issue, _ in pending]
+        comments = [comments_data for _, comments_data in pending]
+        # One timestamp per page; passed explicitly so worker processes use it too
+        scraped_at = [self.transformer.refresh_scraped_at()] * len(pending)
+        if self._executor is None:
+            return map(self.transformer.transform_issue, issues, comments, scraped_at)
+        return self._executor.map(
+            DataTransformer.transform_issue, issues, comments, scraped_at, chunksize=8
+        )
+    
+    def _save_batch(
+        self,
+        project: str,
+        batch: List[dict],
+        start_at: Optional[int] = None,
+        order: Optional[str] = None
+    ):
+        """
+        Append a batch to the output file, then record it in the saved state.
+        
+        Issues are marked processed only once written, so saved state never
+        lists issues missing from the output.
+        
+        Args:
+            project: Project key
+            batch: Transformed issues to write
+            start_at: Pagination offset to record along with the batch, if any
+            order: Result ordering the offset refers to
+        """
+        with self._write_lock:
+            self.transformer.write_jsonl(batch, self._out)
+            self._out.flush()
+        for record in batch:
+            self.state_manager.mark_issue_processed(project, record['issue_key'])
+        if start_at is not None:
+            self.state_manager.update_project_progress(project, start_at, order=order)
+        self.state_manager.save_state(project)
+    
+    def _scrape_project_guarded(self, project: str) -> dict:
+        """Scrape one project, returning its statistics instead of raising."""
+        try:
+            count = self.scrape_project(project)
+            return {
+                'issues_scraped': count,
+                'success': True
+            }
+        except Exception as e:
+            logger.error(f"Error scraping project {project}: {e}", exc_info=True)
+            return {
+                'issues_scraped': 0,
+                'success': False,
+                'error': str(e)
+            }
+    
     def scrape_all(self) -> dict:
         """
         Scrape all configured projects.
@@ -229,26 +396,21 @@ class JiraScraper:
         
         logger.info(f"Starting scrape for {len(self.projects)} projects")
         
-        for project in self.projects:
-            try:
-                count = self.scrape_project(project)
-                stats['projects'][project] = {
-                    'issues_scraped': count,
-                    'success': True
-                }
-                stats['total_issues'] += count
-            except Exception as e:
-                logger.error(f"Error scraping project {project}: {e}", exc_info=True)
-                stats['projects'][project] = {
-                    'issues_scraped': 0,
-                    'success': False,
-                    'error': str(e)
-                }
-            
-            # Delay between projects
-            if project != self.projects[-1]:
-                logger.info("Waiting before next project...")
-                time.sleep(self.delay_between_requests * 2)
+        # Projects are independent; concurrent ones share the client's connection pool and rate limit
+        workers = min(self.project_workers, len(self.projects))
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            mapper = pool.map if pool is not None else map
+            for project, result in zip(self.projects, mapper(self._scrape_project_guarded, self.projects)):
+                stats['projects'][project] = result
+                stats['total_issues'] += result['issues_scraped']
+        except BaseException:
+            # Let project threads save their current batch and stop
+            self._stop.set()
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown()
         
         logger.info(f"Scraping complete. Total issues: {stats['total_issues']}")
         return stats
@@ -262,5 +424,10 @@ class JiraScraper:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._fetch_pool.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._out.close()
+        self.state_manager.close()
         self.client.__exit__(exc_type, exc_val, exc_tb)
 
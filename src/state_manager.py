@@ -3,17 +3,153 @@ State management for resuming interrupted scrapes.
 Tracks progress per project and allows seamless resumption.
 """
 
-import json
 import os
-from typing import Dict, Optional, Set
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set
 from pathlib import Path
 import logging
 
+# Handle both package and direct imports
+try:
+    from .json_utils import dumps, dumps_line, loads
+except ImportError:
+    # For direct script execution
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.json_utils import dumps, dumps_line, loads
+
 logger = logging.getLogger(__name__)
 
 
+class _ProjectState:
+    """
+    Saved state of a single project.
+    
+    Persisted as a JSON snapshot (<project>.json) plus an append-only log of
+    changes made since the snapshot (<project>.log).
+    """
+    
+    def __init__(self, state_dir: Path, project: str):
+        self.project = project
+        self.state_file = state_dir / f"{project}.json"
+        self.log_file = state_dir / f"{project}.log"
+        self.progress: Dict = {}
+        self.processed_issues: Set[str] = set()
+        self.last_updated: Optional[str] = None
+        # Log entries recorded since the last save, written by the next save()
+        self.pending: List[bytes] = []
+        self.unsaved_issues = 0
+        self.saves_since_compact = 0
+        self.lock = threading.RLock()
+        self._load()
+        has_log = self.log_file.exists() and self.log_file.stat().st_size > 0
+        self._replay_log()
+        self._log = open(self.log_file, 'ab')
+        if has_log:
+            # Fold the replayed log into the snapshot so new entries never follow
+            # a torn line from an interrupted run
+            self.compact()
+    
+    def _load(self):
+        """Load the project snapshot from disk if it exists."""
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = loads(f.read())
+            self.progress = state.get('progress', {})
+            # Processed issue keys are stored as a list but kept as a set in memory
+            self.processed_issues = set(state.get('processed_issues', []))
+            self.last_updated = state.get('last_updated')
+        except Exception as e:
+            logger.warning(f"Failed to load state for {self.project}: {e}. Starting fresh.")
+    
+    def _replay_log(self):
+        """Apply changes logged since the last snapshot."""
+        if not self.log_file.exists():
+            return
+        replayed = 0
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    # Torn final line from an interrupted write
+                    logger.warning(f"Ignoring malformed state log entry for {self.project}")
+                    continue
+                if 'k' in entry:
+                    self.processed_issues.add(entry['k'])
+                elif 'progress' in entry:
+                    self.progress = entry['progress']
+                replayed += 1
+        if replayed:
+            logger.info(f"Replayed {replayed} state log entries for {self.project}")
+    
+    def save(self, compact_interval: int):
+        """Append pending changes to the log, compacting every compact_interval saves."""
+        self.last_updated = datetime.utcnow().isoformat()
+        if self.pending:
+            self._log.write(b''.join(self.pending))
+            self._log.flush()
+            self.pending = []
+            self.unsaved_issues = 0
+        self.saves_since_compact += 1
+        if self.saves_since_compact >= compact_interval:
+            self.compact()
+    
+    def compact(self):
+        """Rewrite the snapshot and truncate the log."""
+        state = {
+            'progress': self.progress,
+            # Written sorted for stable diffs
+            'processed_issues': sorted(self.processed_issues),
+            'last_updated': self.last_updated
+        }
+        tmp_file = self.state_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(dumps(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+        self._log.close()
+        self._log = open(self.log_file, 'wb')
+        self.pending = []
+        self.unsaved_issues = 0
+        self.saves_since_compact = 0
+    
+    def close(self):
+        """Compact on clean shutdown and close the log."""
+        try:
+            # Unsaved issues may not have been written to the output yet; leave
+            # them out so they are scraped again on resume
+            if not self.unsaved_issues:
+                self.compact()
+        finally:
+            self._log.close()
+    
+    def delete(self):
+        """Remove the project's files from disk."""
+        self._log.close()
+        for path in (self.state_file, self.log_file):
+            if path.exists():
+                path.unlink()
+
+
 class StateManager:
-    """Manages scraping state to enable resume functionality."""
+    """
+    Manages scraping state to enable resume functionality.
+    
+    Each project's state lives in its own files under state_dir (a JSON snapshot
+    plus an append-only log of changes since the snapshot), so saving one project
+    never rewrites another's. Saving only appends to the log; the snapshot is
+    rewritten (and the log truncated) every COMPACT_INTERVAL saves and on close.
+    index.json lists the projects with saved state. Project state is loaded on
+    first use and may be modified from several threads.
+    """
+    
+    # Number of save_state() calls between snapshot rewrites
+    COMPACT_INTERVAL = 100
     
     def __init__(self, state_dir: str = "state"):
         """
@@ -24,40 +160,101 @@ class StateManager:
         """
         self.state_dir = Path(state_dir)
         self.state_dir.mkdir(exist_ok=True)
-        self.state_file = self.state_dir / "scrape_state.json"
-        self.state: Dict = self._load_state()
+        self.index_file = self.state_dir / "index.json"
+        self.states: Dict[str, _ProjectState] = {}
+        self._lock = threading.Lock()
+        self.projects: Set[str] = self._load_index()
+        self._migrate_legacy_state()
     
-    def _load_state(self) -> Dict:
-        """Load state from disk if it exists."""
-        if self.state_file.exists():
+    def _load_index(self) -> Set[str]:
+        """Load the set of projects with saved state."""
+        if self.index_file.exists():
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-                    logger.info(f"Loaded state: {len(state.get('processed_issues', {}))} projects tracked")
-                    return state
+                with open(self.index_file, 'rb') as f:
+                    projects = set(loads(f.read()).get('projects', []))
+                logger.info(f"Loaded state index: {len(projects)} projects tracked")
+                return projects
             except Exception as e:
-                logger.warning(f"Failed to load state: {e}. Starting fresh.")
-                return self._default_state()
-        return self._default_state()
-    
-    def _default_state(self) -> Dict:
-        """Return default empty state structure."""
-        return {
-            'projects': {},
-            'processed_issues': {},
-            'last_updated': None
-        }
+                logger.warning(f"Failed to load state index: {e}. Starting fresh.")
+        return set()
     
-    def save_state(self):
-        """Save current state to disk."""
-        from datetime import datetime
-        self.state['last_updated'] = datetime.utcnow().isoformat()
+    def _save_index(self):
+        """Rewrite index.json from the set of known projects."""
+        tmp_file = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(dumps({'projects': sorted(self.projects)}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.index_file)
+    
+    def _migrate_legacy_state(self):
+        """Split a single-file scrape_state.json into per-project files."""
+        legacy_file = self.state_dir / "scrape_state.json"
+        if not legacy_file.exists():
+            return
+        
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self.state, f, indent=2)
-            logger.debug("State saved successfully")
+            with open(legacy_file, 'rb') as f:
+                state = loads(f.read())
         except Exception as e:
-            logger.error(f"Failed to save state: {e}")
+            # Leave the file in place so no saved progress is thrown away
+            logger.warning(f"Failed to load legacy state: {e}. Ignoring it.")
+            return
+        progress: Dict[str, Dict] = state.get('projects', {})
+        processed: Dict[str, List[str]] = state.get('processed_issues', {})
+        last_updated = state.get('last_updated')
+        
+        projects = set(progress) | set(processed)
+        for project in projects:
+            project_state = self._get(project)
+            with project_state.lock:
+                project_state.progress = progress.get(project, project_state.progress)
+                project_state.processed_issues.update(processed.get(project, []))
+                project_state.last_updated = project_state.last_updated or last_updated
+                project_state.compact()
+        self._save_index()
+        
+        legacy_file.unlink()
+        logger.info(f"Migrated legacy state for {len(projects)} projects")
+    
+    def _get(self, project: str) -> _ProjectState:
+        """Return the state for a project, loading it from disk on first use."""
+        project_state = self.states.get(project)
+        if project_state is None:
+            with self._lock:
+                project_state = self.states.get(project)
+                if project_state is None:
+                    project_state = _ProjectState(self.state_dir, project)
+                    self.states[project] = project_state
+                    if project not in self.projects:
+                        self.projects.add(project)
+                        self._save_index()
+        return project_state
+    
+    def save_state(self, project: Optional[str] = None):
+        """
+        Save changes since the last save by appending them to the state log.
+        
+        Args:
+            project: Project to save (default: all loaded projects)
+        """
+        targets = [self._get(project)] if project else list(self.states.values())
+        for project_state in targets:
+            with project_state.lock:
+                try:
+                    project_state.save(self.COMPACT_INTERVAL)
+                    logger.debug(f"State saved successfully for {project_state.project}")
+                except Exception as e:
+                    logger.error(f"Failed to save state for {project_state.project}: {e}")
+    
+    def close(self):
+        """Compact state on clean shutdown and close the state logs."""
+        for project_state in list(self.states.values()):
+            with project_state.lock:
+                try:
+                    project_state.close()
+                except Exception as e:
+                    logger.error(f"Failed to compact state for {project_state.project}: {e}")
     
     def get_processed_issues(self, project: str) -> Set[str]:
         """
@@ -65,11 +262,11 @@ class StateManager:
         
         Args:
             project: Project key
-            
+        
         Returns:
             Set of processed issue keys
         """
-        return set(self.state.get('processed_issues', {}).get(project, []))
+        return self._get(project).processed_issues
     
     def mark_issue_processed(self, project: str, issue_key: str):
         """
@@ -79,13 +276,12 @@ class StateManager:
             project: Project key
             issue_key: Issue key
         """
-        if 'processed_issues' not in self.state:
-            self.state['processed_issues'] = {}
-        if project not in self.state['processed_issues']:
-            self.state['processed_issues'][project] = []
-        
-        if issue_key not in self.state['processed_issues'][project]:
-            self.state['processed_issues'][project].append(issue_key)
+        project_state = self._get(project)
+        with project_state.lock:
+            if issue_key not in project_state.processed_issues:
+                project_state.processed_issues.add(issue_key)
+                project_state.pending.append(dumps_line({'k': issue_key}))
+                project_state.unsaved_issues += 1
     
     def get_project_progress(self, project: str) -> Dict:
         """
@@ -93,17 +289,18 @@ class StateManager:
         
         Args:
             project: Project key
-            
+        
         Returns:
             Dictionary with progress info (start_at, last_issue_key, etc.)
         """
-        return self.state.get('projects', {}).get(project, {})
+        return self._get(project).progress
     
     def update_project_progress(
         self,
         project: str,
         start_at: int,
-        last_issue_key: Optional[str] = None
+        last_issue_key: Optional[str] = None,
+        order: Optional[str] = None
     ):
         """
         Update progress for a project.
@@ -112,26 +309,31 @@ class StateManager:
             project: Project key
             start_at: Current pagination offset
             last_issue_key: Last processed issue key
+            order: Result ordering the offset refers to
         """
-        if 'projects' not in self.state:
-            self.state['projects'] = {}
-        self.state['projects'][project] = {
+        progress = {
             'start_at': start_at,
-            'last_issue_key': last_issue_key
+            'last_issue_key': last_issue_key,
+            'order': order
         }
+        project_state = self._get(project)
+        with project_state.lock:
+            project_state.progress = progress
+            project_state.pending.append(dumps_line({'progress': progress}))
     
     def reset_project(self, project: str):
         """Reset state for a specific project."""
-        if 'projects' in self.state and project in self.state['projects']:
-            del self.state['projects'][project]
-        if 'processed_issues' in self.state and project in self.state['processed_issues']:
-            del self.state['processed_issues'][project]
+        project_state = self._get(project)
+        with self._lock, project_state.lock:
+            try:
+                project_state.delete()
+                del self.states[project]
+                self.projects.discard(project)
+                self._save_index()
+            except Exception as e:
+                logger.error(f"Failed to remove state after reset: {e}")
         logger.info(f"Reset state for project {project}")
     
     def get_total_processed(self) -> int:
         """Get total number of processed issues across all projects."""
-        total = 0
-        for issues in self.state.get('processed_issues', {}).values():
-            total += len(issues)
-        return total
-
+        return sum(len(self._get(project).processed_issues) for project in list(self.projects))